@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Confluence 离线部署 - Docker 镜像工具公共模块
+
+供 download_images.py 和 import_images.py 共用：
+- 终端颜色与日志输出
+- docker 命令调用与 Docker 环境检查
+- 本地镜像存在性缓存
+- 镜像归档文件 (.tar / .tar.zst) 命名约定
+"""
+
+import os
+import json
+import shutil
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Optional, Set
+
+class Colors:
+    """终端颜色定义"""
+    RED = '\033[0;31m'
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    BLUE = '\033[0;34m'
+    PURPLE = '\033[0;35m'
+    CYAN = '\033[0;36m'
+    WHITE = '\033[1;37m'
+    NC = '\033[0m'  # No Color
+
+class Logger:
+    """日志记录器"""
+    
+    @staticmethod
+    def info(message: str):
+        print(f"{Colors.GREEN}[INFO]{Colors.NC} {message}")
+    
+    @staticmethod
+    def warn(message: str):
+        print(f"{Colors.YELLOW}[WARN]{Colors.NC} {message}")
+    
+    @staticmethod
+    def error(message: str):
+        print(f"{Colors.RED}[ERROR]{Colors.NC} {message}")
+    
+    @staticmethod
+    def debug(message: str):
+        print(f"{Colors.BLUE}[DEBUG]{Colors.NC} {message}")
+    
+    @staticmethod
+    def success(message: str):
+        print(f"{Colors.GREEN}[SUCCESS]{Colors.NC} {message}")
+
+# docker 可执行文件的绝对路径，在模块导入时解析一次 (未安装时为 None)
+_DOCKER: Optional[str] = shutil.which('docker')
+
+@lru_cache(maxsize=None)
+def zstd_binary() -> Optional[str]:
+    """zstd 可执行文件路径，未安装时返回 None"""
+    return shutil.which('zstd')
+
+def docker_cmd(args: List[str]) -> List[str]:
+    """构造 docker 命令行 (使用绝对路径，避免每次执行时搜索 PATH)"""
+    return [_DOCKER or 'docker'] + list(args)
+
+def run_docker(args: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """执行 docker 命令，参数与 subprocess.run 相同"""
+    return subprocess.run(docker_cmd(args), **kwargs)
+
+_docker_ok: Optional[bool] = None
+
+# Docker 检查结果的磁盘缓存，避免脚本频繁重复运行时每次都访问守护进程
+DOCKER_PROBE_TTL = 60
+DOCKER_PROBE_CACHE = Path(
+    os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+) / 'confluence-docker' / 'docker_probe.json'
+
+def _docker_target() -> str:
+    """当前使用的 Docker 守护进程 (DOCKER_HOST / DOCKER_CONTEXT)，用于区分缓存记录"""
+    return f"{os.environ.get('DOCKER_HOST', '')}|{os.environ.get('DOCKER_CONTEXT', '')}"
+
+def _read_docker_probe() -> Optional[str]:
+    """读取未过期且属于当前守护进程的 Docker 检查缓存，返回服务端版本"""
+    try:
+        with open(DOCKER_PROBE_CACHE, 'r', encoding='utf-8') as f:
+            probe = json.load(f)
+        ts = probe.get('ts')
+        if not isinstance(ts, (int, float)):
+            return None
+        # 时间戳在未来 (时钟回拨或手动修改) 时视为过期
+        age = time.time() - ts
+        if probe.get('ok') and probe.get('target') == _docker_target() \
+                and 0 <= age < DOCKER_PROBE_TTL:
+            return probe.get('version') or 'unknown'
+    except (OSError, ValueError, AttributeError, TypeError):
+        pass
+    return None
+
+def _write_docker_probe(version: str):
+    """写入 Docker 检查缓存 (失败时忽略)"""
+    try:
+        DOCKER_PROBE_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        with open(DOCKER_PROBE_CACHE, 'w', encoding='utf-8') as f:
+            json.dump({'ts': time.time(), 'ok': True, 'target': _docker_target(),
+                       'version': version}, f)
+    except OSError:
+        pass
+
+def check_docker() -> bool:
+    """检查 Docker 是否可用 (结果在进程内缓存，成功结果另在磁盘缓存 60 秒)"""
+    global _docker_ok
+    if _docker_ok is not None:
+        return _docker_ok
+    
+    if _DOCKER is None:
+        Logger.error("Docker 未安装")
+        _docker_ok = False
+        return _docker_ok
+    
+    cached_version = _read_docker_probe()
+    if cached_version is not None:
+        Logger.info(f"Docker 版本: {cached_version} (缓存)")
+        _docker_ok = True
+        return _docker_ok
+    
+    try:
+        # docker info 同时检查守护进程状态并返回服务端版本
+        result = run_docker(['info', '--format', '{{.ServerVersion}}'],
+                            capture_output=True, text=True, timeout=5)
+    except FileNotFoundError:
+        Logger.error("Docker 未安装")
+        _docker_ok = False
+        return _docker_ok
+    except subprocess.TimeoutExpired:
+        Logger.error("Docker 守护进程无响应")
+        _docker_ok = False
+        return _docker_ok
+    
+    if result.returncode == 0:
+        version = result.stdout.strip()
+        Logger.info(f"Docker 版本: {version}")
+        Logger.info("Docker 守护进程运行正常")
+        _write_docker_probe(version)
+        _docker_ok = True
+    elif "Cannot connect to the Docker daemon" in result.stderr:
+        Logger.error("Docker 守护进程未运行，请启动 Docker 服务")
+        _docker_ok = False
+    else:
+        Logger.error(f"Docker 检查失败: {result.stderr.strip()}")
+        _docker_ok = False
+    
+    return _docker_ok
+
+# docker images 对 Docker Hub 镜像显示的是省略了这些前缀的简短名称
+_DOCKER_HUB_PREFIXES = ('docker.io/library/', 'docker.io/')
+
+def normalize_image(image: str) -> str:
+    """补全镜像标签并去掉 Docker Hub 前缀，与 docker images 的输出格式保持一致"""
+    for prefix in _DOCKER_HUB_PREFIXES:
+        if image.startswith(prefix):
+            image = image[len(prefix):]
+            break
+    if is_digest_reference(image):
+        return image
+    if ':' not in image.rsplit('/', 1)[-1]:
+        return f"{image}:latest"
+    return image
+
+def is_digest_reference(image: str) -> bool:
+    """是否为按摘要引用的镜像 (repo@sha256:...)，docker images 的名称:标签输出无法表示"""
+    return '@' in image
+
+def image_inspect_exists(image: str) -> bool:
+    """通过 docker image inspect 检查单个镜像是否存在本地"""
+    try:
+        result = run_docker(['image', 'inspect', image], capture_output=True)
+    except FileNotFoundError:
+        return False
+    return result.returncode == 0
+
+# 镜像归档文件后缀: docker save 原始输出，或经 zstd 压缩
+TAR_SUFFIX = '.tar'
+ZSTD_TAR_SUFFIX = '.tar.zst'
+ARCHIVE_SUFFIXES = (TAR_SUFFIX, ZSTD_TAR_SUFFIX)
+
+def is_zstd_archive(path: Path) -> bool:
+    """是否为 zstd 压缩的镜像归档"""
+    return path.name.endswith(ZSTD_TAR_SUFFIX)
+
+def archive_stem(path: Path) -> str:
+    """去掉 .tar / .tar.zst 后缀的文件名"""
+    for suffix in (ZSTD_TAR_SUFFIX, TAR_SUFFIX):
+        if path.name.endswith(suffix):
+            return path.name[:-len(suffix)]
+    return path.stem
+
+def sidecar_path(path: Path) -> Path:
+    """镜像归档对应的 .json 附属文件路径"""
+    return path.with_name(f"{archive_stem(path)}.json")
+
+def local_image_set() -> Set[str]:
+    """一次 docker images 调用获取本地所有镜像名称"""
+    result = run_docker(['images', '--format', '{{.Repository}}:{{.Tag}}'],
+                        capture_output=True, text=True, check=True)
+    return set(result.stdout.splitlines())
+
+class LocalImageCache:
+    """本地镜像存在性缓存 (线程安全)"""
+    
+    def __init__(self):
+        # 本地全部镜像 (首次需要时加载)
+        self._local_images: Optional[Set[str]] = None
+        self._lock = threading.Lock()
+        # 针对本次任务镜像的定向查询结果
+        self._image_exists: Dict[str, bool] = {}
+    
+    def _load(self) -> Set[str]:
+        """加载本地全部镜像名称"""
+        with self._lock:
+            if self._local_images is None:
+                try:
+                    self._local_images = local_image_set()
+                except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                    Logger.debug(f"获取本地镜像列表失败: {e}")
+                    self._local_images = set()
+            return self._local_images
+    
+    def bulk_check(self, images: List[str]) -> Dict[str, bool]:
+        """一次 docker image ls 调用检查一批镜像是否存在本地"""
+        names = list(dict.fromkeys(normalize_image(image) for image in images))
+        
+        # 按摘要引用的镜像无法通过名称:标签匹配，逐个使用 docker image inspect 检查
+        exists = {name: image_inspect_exists(name) for name in names if is_digest_reference(name)}
+        self._image_exists.update(exists)
+        names = [name for name in names if name not in exists]
+        if not names:
+            return exists
+        
+        args = ['image', 'ls', '--format', '{{.Repository}}:{{.Tag}}']
+        for name in names:
+            args.extend(['--filter', f'reference={name}'])
+        
+        try:
+            result = run_docker(args, capture_output=True, text=True, check=True)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            Logger.debug(f"批量检查本地镜像失败: {e}")
+            return exists
+        
+        found = set(result.stdout.splitlines())
+        listed = {name: name in found for name in names}
+        self._image_exists.update(listed)
+        exists.update(listed)
+        return exists
+    
+    def mark_local(self, image: str):
+        """记录镜像已存在本地 (拉取或导入成功后调用)"""
+        name = normalize_image(image)
+        self._image_exists[name] = True
+        with self._lock:
+            if self._local_images is not None:
+                self._local_images.add(name)
+    
+    def exists(self, image: str) -> bool:
+        """检查镜像是否已存在本地"""
+        name = normalize_image(image)
+        if name in self._image_exists:
+            return self._image_exists[name]
+        if is_digest_reference(name):
+            self._image_exists[name] = image_inspect_exists(name)
+            return self._image_exists[name]
+        return name in self._load()
@@ -6,7 +6,7 @@ Confluence 离线部署 - Docker 镜像下载工具 (Python版本)
 - 从 docker-compose.yml 文件解析镜像列表
 - 支持多个镜像并发下载
 - 支持 MySQL 和 PostgreSQL 数据库选择
-- 自动保存镜像为 tar 文件
+- 自动保存镜像为 tar 文件 (安装了 zstd 时压缩为 .tar.zst)
 - 生成镜像清单文件
 - 支持断点续传和重试机制
 """
@@ -16,56 +16,57 @@ import sys
 import json
 import yaml
 import argparse
-import subprocess
-import threading
+import asyncio
 import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional, Tuple
 
-class Colors:
-    """终端颜色定义"""
-    RED = '\033[0;31m'
-    GREEN = '\033[0;32m'
-    YELLOW = '\033[1;33m'
-    BLUE = '\033[0;34m'
-    PURPLE = '\033[0;35m'
-    CYAN = '\033[0;36m'
-    WHITE = '\033[1;37m'
-    NC = '\033[0m'  # No Color
+from _docker_common import (Colors, Logger, LocalImageCache, ARCHIVE_SUFFIXES, TAR_SUFFIX,
+                            ZSTD_TAR_SUFFIX, archive_stem, check_docker, docker_cmd,
+                            sidecar_path, zstd_binary)
 
-class Logger:
-    """日志记录器"""
-    
-    @staticmethod
-    def info(message: str):
-        print(f"{Colors.GREEN}[INFO]{Colors.NC} {message}")
-    
-    @staticmethod
-    def warn(message: str):
-        print(f"{Colors.YELLOW}[WARN]{Colors.NC} {message}")
-    
-    @staticmethod
-    def error(message: str):
-        print(f"{Colors.RED}[ERROR]{Colors.NC} {message}")
-    
-    @staticmethod
-    def debug(message: str):
-        print(f"{Colors.BLUE}[DEBUG]{Colors.NC} {message}")
-    
-    @staticmethod
-    def success(message: str):
-        print(f"{Colors.GREEN}[SUCCESS]{Colors.NC} {message}")
+# 优先使用 libyaml 的 C 解析器，未安装 libyaml 时回退到纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 镜像名转文件名: ':' -> '-', '/' -> '_'
+_SAFE_NAME_TABLE = str.maketrans({':': '-', '/': '_'})
+
+def default_pull_workers() -> int:
+    """默认拉取并发数 (网络密集型)"""
+    return min(24, (os.cpu_count() or 4) * 4)
 
 class DockerImageDownloader:
     """Docker 镜像下载器"""
     
-    def __init__(self, output_dir: str = "offline_images", max_workers: int = 3):
+    def __init__(self, output_dir: str = "offline_images", max_workers: Optional[int] = None,
+                 compress: Optional[bool] = None):
         self.output_dir = Path(output_dir)
-        self.max_workers = max_workers
+        # 拉取受网络带宽限制，默认按 CPU 核数放大并发
+        self.max_workers = max_workers or default_pull_workers()
+        # docker save 受磁盘带宽限制，并发数不超过 2
+        self.save_workers = max(1, min(2, self.max_workers))
         self.downloaded_images = []
         self.failed_images = []
         
+        # 使用 zstd 压缩保存的镜像 (默认在安装了 zstd 时启用)
+        # 未显式指定格式时，已有的另一种格式归档也视为已完成
+        self.accept_any_format = compress is None
+        if compress is None:
+            compress = zstd_binary() is not None
+        elif compress and zstd_binary() is None:
+            Logger.warn("未找到 zstd，镜像将以未压缩的 tar 格式保存")
+            compress = False
+        self.compress = compress
+        
+        # 镜像名 -> 文件名 (在 download_images 开始时一次性计算)
+        self._safe_names: Dict[str, str] = {}
+        
+        # 本地镜像存在性缓存
+        self._image_cache = LocalImageCache()
+        
         # 预定义的镜像配置
         self.image_configs = {
             'mysql': {
@@ -81,22 +82,11 @@ class DockerImageDownloader:
         # 确保输出目录存在
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
-    def check_docker(self) -> bool:
-        """检查 Docker 是否可用"""
-        try:
-            result = subprocess.run(['docker', '--version'], 
-                                  capture_output=True, text=True, check=True)
-            Logger.info(f"Docker 版本: {result.stdout.strip()}")
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            Logger.error("Docker 未安装或不可用")
-            return False
-    
     def parse_compose_file(self, compose_file: str) -> List[str]:
         """解析 docker-compose.yml 文件获取镜像列表"""
         try:
             with open(compose_file, 'r', encoding='utf-8') as f:
-                compose_data = yaml.safe_load(f)
+                compose_data = yaml.load(f, Loader=_YamlLoader)
             
             images = []
             services = compose_data.get('services', {})
@@ -124,68 +114,103 @@ class DockerImageDownloader:
         
         return self.image_configs[db_type][confluence_version]
     
+    @staticmethod
+    def _safe_name(image: str) -> str:
+        """将镜像名转换为可用作文件名的形式 (例如 haxqer/confluence:9.2.1 -> haxqer_confluence-9.2.1)"""
+        return image.translate(_SAFE_NAME_TABLE)
+    
+    def _tar_file(self, image: str) -> Path:
+        """镜像对应的 tar 文件路径 (启用压缩时为 .tar.zst)"""
+        safe_name = self._safe_names.get(image) or self._safe_name(image)
+        suffix = ZSTD_TAR_SUFFIX if self.compress else TAR_SUFFIX
+        return self.output_dir / f"{safe_name}{suffix}"
+    
     def image_exists_locally(self, image: str) -> bool:
         """检查镜像是否已存在本地"""
-        try:
-            subprocess.run(['docker', 'image', 'inspect', image], 
-                         capture_output=True, check=True)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+        return self._image_cache.exists(image)
     
-    def pull_image(self, image: str) -> bool:
+    async def pull_image(self, image: str) -> bool:
         """拉取单个镜像"""
         try:
             Logger.info(f"正在拉取镜像: {image}")
             
-            # 检查镜像是否已存在
-            if self.image_exists_locally(image):
-                Logger.info(f"镜像 {image} 已存在本地，跳过拉取")
-                return True
-            
             # 拉取镜像
-            result = subprocess.run(['docker', 'pull', image], 
-                                  capture_output=True, text=True)
+            proc = await asyncio.create_subprocess_exec(
+                *docker_cmd(['pull', image]),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+            _, stderr = await proc.communicate()
             
-            if result.returncode == 0:
+            if proc.returncode == 0:
+                self._image_cache.mark_local(image)
                 Logger.success(f"成功拉取镜像: {image}")
                 return True
             else:
                 Logger.error(f"拉取镜像失败: {image}")
-                Logger.error(f"错误信息: {result.stderr}")
+                Logger.error(f"错误信息: {stderr.decode(errors='replace')}")
                 return False
                 
         except Exception as e:
             Logger.error(f"拉取镜像 {image} 时发生异常: {e}")
             return False
     
-    def save_image(self, image: str) -> bool:
+    async def save_image(self, image: str) -> bool:
         """保存镜像为 tar 文件"""
         try:
-            # 生成文件名
-            safe_name = image.replace(':', '-').replace('/', '_')
-            tar_file = self.output_dir / f"{safe_name}.tar"
-            
-            # 检查文件是否已存在
-            if tar_file.exists():
-                Logger.info(f"镜像文件已存在: {tar_file}")
-                return True
+            tar_file = self._tar_file(image)
             
             Logger.info(f"正在保存镜像: {image} -> {tar_file}")
             
-            # 保存镜像
-            with open(tar_file, 'wb') as f:
-                result = subprocess.run(['docker', 'save', image], 
-                                      stdout=f, stderr=subprocess.PIPE)
+            # 保存镜像: 输出直接写入文件描述符 (启用压缩时经 zstd 多线程压缩)，stderr 逐行读取
+            stderr_lines = []
+            zstd_proc = None
+            with open(tar_file, 'wb', buffering=0) as f:
+                if self.compress:
+                    # docker save 与 zstd 之间通过 OS 管道直连，数据不经过 Python
+                    read_fd, write_fd = os.pipe()
+                    try:
+                        zstd_proc = await asyncio.create_subprocess_exec(
+                            zstd_binary(), '-T0', '-3', '-q', '-c',
+                            stdin=read_fd, stdout=f.fileno(), stderr=asyncio.subprocess.PIPE
+                        )
+                        proc = await asyncio.create_subprocess_exec(
+                            *docker_cmd(['save', image]),
+                            stdout=write_fd, stderr=asyncio.subprocess.PIPE
+                        )
+                    finally:
+                        os.close(read_fd)
+                        os.close(write_fd)
+                else:
+                    proc = await asyncio.create_subprocess_exec(
+                        *docker_cmd(['save', image]),
+                        stdout=f.fileno(), stderr=asyncio.subprocess.PIPE
+                    )
+                async for raw_line in proc.stderr:
+                    line = raw_line.decode(errors='replace').rstrip()
+                    if line:
+                        stderr_lines.append(line)
+                        Logger.debug(f"[{image}] {line}")
+                returncode = await proc.wait()
+                if zstd_proc is not None:
+                    _, zstd_error = await zstd_proc.communicate()
+                    if zstd_proc.returncode != 0:
+                        stderr_lines.append(f"zstd: {zstd_error.decode(errors='replace').strip()}")
+                        returncode = returncode or zstd_proc.returncode
+                # 通过已打开的文件描述符获取文件大小
+                size_bytes = os.fstat(f.fileno()).st_size
             
-            if result.returncode == 0:
-                # 获取文件大小
-                size_mb = tar_file.stat().st_size / (1024 * 1024)
+            if returncode == 0:
+                # 写入附属文件记录真实镜像名，导入时无需从文件名反推
+                with open(sidecar_path(tar_file), 'w', encoding='utf-8') as f:
+                    json.dump({"image": image}, f, ensure_ascii=False)
+                self._add_downloaded(image, tar_file, size_bytes)
+                size_mb = size_bytes / (1024 * 1024)
                 Logger.success(f"成功保存镜像: {tar_file} ({size_mb:.1f} MB)")
                 return True
             else:
                 Logger.error(f"保存镜像失败: {image}")
-                Logger.error(f"错误信息: {result.stderr.decode()}")
+                error_output = '\n'.join(stderr_lines)
+                Logger.error(f"错误信息: {error_output}")
                 # 删除失败的文件
                 if tar_file.exists():
                     tar_file.unlink()
@@ -195,57 +220,106 @@ class DockerImageDownloader:
             Logger.error(f"保存镜像 {image} 时发生异常: {e}")
             return False
     
-    def download_and_save_image(self, image: str) -> Tuple[str, bool]:
-        """下载并保存单个镜像"""
-        success = True
-        
-        # 拉取镜像
-        if not self.pull_image(image):
-            success = False
-        
-        # 保存镜像
-        if success and not self.save_image(image):
-            success = False
-        
+    def _add_downloaded(self, image: str, tar_file: Path, size_bytes: int):
+        """记录已保存镜像的清单信息"""
+        self.downloaded_images.append({
+            "name": image,
+            "file": tar_file.name,
+            "size_bytes": size_bytes
+        })
+    
+    def _record_result(self, image: str, success: bool):
+        """记录单个镜像的处理结果 (成功的镜像已由 save_image 记录)"""
         if success:
-            self.downloaded_images.append(image)
+            Logger.debug(f"✓ {image}")
         else:
             self.failed_images.append(image)
+            Logger.debug(f"✗ {image}")
+    
+    def plan_downloads(self, images: List[str]) -> Tuple[List[str], List[str], Dict[str, Tuple[Path, int]]]:
+        """将镜像划分为需要拉取、只需保存和已完成三类
+        
+        返回 (to_pull, to_save, already_done)，already_done 为镜像名到 (已有归档文件, 文件大小) 的映射。
+        自动选择格式时，.tar 与 .tar.zst 任一格式的归档存在即视为已完成 (优先匹配本次运行使用的格式)；
+        显式指定格式时 (例如 --no-compress) 只认可该格式的归档。
+        """
+        # 一次目录扫描获取已有的 tar 文件及其大小
+        with os.scandir(self.output_dir) as it:
+            existing_tars = {
+                entry.name: entry.stat().st_size
+                for entry in it
+                if entry.name.endswith(ARCHIVE_SUFFIXES) and entry.is_file()
+            }
+        
+        # 一次性检查本批镜像是否已存在本地
+        self._image_cache.bulk_check(images)
+        
+        to_pull, to_save, already_done = [], [], {}
+        for image in images:
+            tar_file = self._tar_file(image)
+            safe_name = archive_stem(tar_file)
+            candidates = [tar_file.name]
+            if self.accept_any_format:
+                candidates += [
+                    f"{safe_name}{suffix}" for suffix in ARCHIVE_SUFFIXES
+                    if f"{safe_name}{suffix}" != tar_file.name
+                ]
+            found = next((name for name in candidates if name in existing_tars), None)
+            if found is not None:
+                already_done[image] = (self.output_dir / found, existing_tars[found])
+            elif self.image_exists_locally(image):
+                to_save.append(image)
+            else:
+                to_pull.append(image)
         
-        return image, success
+        return to_pull, to_save, already_done
     
-    def download_images(self, images: List[str]) -> bool:
-        """并发下载多个镜像"""
+    async def download_images(self, images: List[str]) -> bool:
+        """并发下载多个镜像 (拉取与保存分两级流水线执行)"""
         if not images:
             Logger.error("没有要下载的镜像")
             return False
         
         Logger.info(f"开始下载 {len(images)} 个镜像...")
         Logger.info(f"输出目录: {self.output_dir.absolute()}")
-        Logger.info(f"并发数: {self.max_workers}")
+        Logger.info(f"并发数: 拉取 {self.max_workers}, 保存 {self.save_workers}")
+        Logger.info(f"保存格式: {'zstd 压缩 (.tar.zst)' if self.compress else 'tar'}")
         
         start_time = time.time()
         
-        # 使用线程池并发下载
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有下载任务
-            future_to_image = {
-                executor.submit(self.download_and_save_image, image): image 
-                for image in images
-            }
-            
-            # 等待任务完成
-            for future in as_completed(future_to_image):
-                image = future_to_image[future]
-                try:
-                    image_name, success = future.result()
-                    if success:
-                        Logger.debug(f"✓ {image_name}")
-                    else:
-                        Logger.debug(f"✗ {image_name}")
-                except Exception as e:
-                    Logger.error(f"处理镜像 {image} 时发生异常: {e}")
-                    self.failed_images.append(image)
+        images = list(dict.fromkeys(images))
+        self._safe_names = {image: self._safe_name(image) for image in images}
+        
+        # 预先过滤已完成的镜像，只为实际需要的工作创建任务
+        to_pull, to_save, already_done = self.plan_downloads(images)
+        
+        for image, (tar_file, size_bytes) in already_done.items():
+            Logger.info(f"镜像文件已存在: {tar_file}")
+            self._add_downloaded(image, tar_file, size_bytes)
+            self._record_result(image, True)
+        
+        for image in to_save:
+            Logger.info(f"镜像 {image} 已存在本地，跳过拉取")
+        
+        # 拉取与保存分别限制并发; 每个镜像拉取完成后立即进入保存阶段，使不同镜像的拉取与保存重叠
+        pull_sem = asyncio.Semaphore(self.max_workers)
+        save_sem = asyncio.Semaphore(self.save_workers)
+        
+        async def process(image: str, need_pull: bool):
+            if need_pull:
+                async with pull_sem:
+                    pulled = await self.pull_image(image)
+                if not pulled:
+                    self._record_result(image, False)
+                    return
+            async with save_sem:
+                saved = await self.save_image(image)
+            self._record_result(image, saved)
+        
+        await asyncio.gather(
+            *(process(image, False) for image in to_save),
+            *(process(image, True) for image in to_pull)
+        )
         
         end_time = time.time()
         duration = end_time - start_time
@@ -271,12 +345,9 @@ class DockerImageDownloader:
         
         if self.downloaded_images:
             print(f"\n{Colors.GREEN}成功下载的镜像:{Colors.NC}")
-            for image in self.downloaded_images:
-                safe_name = image.replace(':', '-').replace('/', '_')
-                tar_file = self.output_dir / f"{safe_name}.tar"
-                if tar_file.exists():
-                    size_mb = tar_file.stat().st_size / (1024 * 1024)
-                    print(f"  ✓ {image} ({size_mb:.1f} MB)")
+            for image_info in self.downloaded_images:
+                size_mb = image_info["size_bytes"] / (1024 * 1024)
+                print(f"  ✓ {image_info['name']} ({size_mb:.1f} MB)")
         
         if self.failed_images:
             print(f"\n{Colors.RED}下载失败的镜像:{Colors.NC}")
@@ -290,20 +361,9 @@ class DockerImageDownloader:
         manifest = {
             "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
             "total_images": len(self.downloaded_images),
-            "images": []
+            "images": self.downloaded_images
         }
         
-        for image in self.downloaded_images:
-            safe_name = image.replace(':', '-').replace('/', '_')
-            tar_file = self.output_dir / f"{safe_name}.tar"
-            
-            image_info = {
-                "name": image,
-                "file": f"{safe_name}.tar",
-                "size_bytes": tar_file.stat().st_size if tar_file.exists() else 0
-            }
-            manifest["images"].append(image_info)
-        
         with open(manifest_file, 'w', encoding='utf-8') as f:
             json.dump(manifest, f, indent=2, ensure_ascii=False)
         
@@ -351,10 +411,12 @@ def main():
     # 其他选项
     parser.add_argument('--output', '-o', default='offline_images',
                        help='输出目录 (默认: offline_images)')
-    parser.add_argument('--workers', '-w', type=int, default=3,
-                       help='并发下载数 (默认: 3)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                       help=f'并发下载数 (默认: CPU 核数 x 4，最多 24，本机为 {default_pull_workers()})')
     parser.add_argument('--no-manifest', action='store_true',
                        help='不生成镜像清单文件')
+    parser.add_argument('--no-compress', action='store_true',
+                       help='不使用 zstd 压缩，保存为原始 tar 文件 (默认: 安装了 zstd 时压缩为 .tar.zst)')
     
     args = parser.parse_args()
     
@@ -364,10 +426,11 @@ def main():
             parser.error("使用预定义配置时，--db 和 --version 参数必须同时指定")
     
     # 创建下载器
-    downloader = DockerImageDownloader(args.output, args.workers)
+    downloader = DockerImageDownloader(args.output, args.workers,
+                                       compress=False if args.no_compress else None)
     
     # 检查 Docker
-    if not downloader.check_docker():
+    if not check_docker():
         sys.exit(1)
     
     # 获取镜像列表
@@ -401,7 +464,7 @@ def main():
         print(f"  {i}. {image}")
     
     # 开始下载
-    success = downloader.download_images(images)
+    success = asyncio.run(downloader.download_images(images))
     
     # 生成清单文件
     if not args.no_manifest and downloader.downloaded_images:
@@ -3,7 +3,7 @@
 Confluence 离线部署 - Docker 镜像导入工具 (Python版本)
 
 功能：
-- 从指定目录导入所有 tar 格式的 Docker 镜像
+- 从指定目录导入所有 tar / tar.zst 格式的 Docker 镜像
 - 支持多个镜像并发导入
 - 支持镜像清单文件验证
 - 自动清理悬空镜像
@@ -14,81 +14,44 @@ import os
 import sys
 import json
 import argparse
+import asyncio
 import subprocess
-import threading
+import tarfile
 import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional, Tuple
 
-class Colors:
-    """终端颜色定义"""
-    RED = '\033[0;31m'
-    GREEN = '\033[0;32m'
-    YELLOW = '\033[1;33m'
-    BLUE = '\033[0;34m'
-    PURPLE = '\033[0;35m'
-    CYAN = '\033[0;36m'
-    WHITE = '\033[1;37m'
-    NC = '\033[0m'  # No Color
+from _docker_common import (Colors, Logger, LocalImageCache, ARCHIVE_SUFFIXES, archive_stem,
+                            check_docker, docker_cmd, is_zstd_archive, run_docker,
+                            sidecar_path, zstd_binary)
 
-class Logger:
-    """日志记录器"""
-    
-    @staticmethod
-    def info(message: str):
-        print(f"{Colors.GREEN}[INFO]{Colors.NC} {message}")
-    
-    @staticmethod
-    def warn(message: str):
-        print(f"{Colors.YELLOW}[WARN]{Colors.NC} {message}")
-    
-    @staticmethod
-    def error(message: str):
-        print(f"{Colors.RED}[ERROR]{Colors.NC} {message}")
-    
-    @staticmethod
-    def debug(message: str):
-        print(f"{Colors.BLUE}[DEBUG]{Colors.NC} {message}")
-    
-    @staticmethod
-    def success(message: str):
-        print(f"{Colors.GREEN}[SUCCESS]{Colors.NC} {message}")
+# tar 归档以两个 512 字节的全零块结尾
+TAR_END_OF_ARCHIVE = 2 * 512
+
+def default_import_workers() -> int:
+    """默认导入并发数 (磁盘密集型)"""
+    return min(8, os.cpu_count() or 4)
 
 class DockerImageImporter:
     """Docker 镜像导入器"""
     
-    def __init__(self, images_dir: str = "offline_images", max_workers: int = 2):
+    # import_single_image 跳过已存在镜像时返回的标记
+    SKIPPED = "skipped"
+    
+    def __init__(self, images_dir: str = "offline_images", max_workers: Optional[int] = None):
         self.images_dir = Path(images_dir)
-        self.max_workers = max_workers
+        # 导入受磁盘和 Docker 守护进程限制，默认并发数不超过 8
+        self.max_workers = max_workers or default_import_workers()
         self.imported_images = []
         self.failed_imports = []
         self.skipped_images = []
         
-        # 线程锁用于同步输出
-        self.print_lock = threading.Lock()
-    
-    def check_docker(self) -> bool:
-        """检查 Docker 是否可用"""
-        try:
-            result = subprocess.run(['docker', '--version'], 
-                                  capture_output=True, text=True, check=True)
-            Logger.info(f"Docker 版本: {result.stdout.strip()}")
-            
-            # 检查 Docker 守护进程是否运行
-            result = subprocess.run(['docker', 'info'], 
-                                  capture_output=True, text=True, check=True)
-            Logger.info("Docker 守护进程运行正常")
-            return True
-        except subprocess.CalledProcessError as e:
-            if "Cannot connect to the Docker daemon" in e.stderr:
-                Logger.error("Docker 守护进程未运行，请启动 Docker 服务")
-            else:
-                Logger.error(f"Docker 检查失败: {e.stderr}")
-            return False
-        except FileNotFoundError:
-            Logger.error("Docker 未安装")
-            return False
+        # 本地镜像存在性缓存
+        self._image_cache = LocalImageCache()
+        # 镜像清单中的 tar 文件名 -> 镜像名
+        self._manifest_names: Dict[str, str] = {}
+        # tar 文件 -> manifest.json 中的镜像标签
+        self._tar_repotags: Dict[Path, List[str]] = {}
     
     def find_image_files(self) -> List[Path]:
         """查找所有镜像文件"""
@@ -96,11 +59,15 @@ class DockerImageImporter:
             Logger.error(f"镜像目录不存在: {self.images_dir}")
             return []
         
-        # 查找所有 .tar 文件
-        tar_files = list(self.images_dir.glob("*.tar"))
+        # 查找所有 .tar / .tar.zst 文件 (scandir 利用目录项类型信息，无需额外 stat)
+        with os.scandir(self.images_dir) as it:
+            tar_files = [
+                Path(entry.path) for entry in it
+                if entry.name.endswith(ARCHIVE_SUFFIXES) and entry.is_file(follow_symlinks=False)
+            ]
         
         if not tar_files:
-            Logger.warn(f"在目录 {self.images_dir} 中未找到 .tar 镜像文件")
+            Logger.warn(f"在目录 {self.images_dir} 中未找到 .tar / .tar.zst 镜像文件")
             return []
         
         Logger.info(f"找到 {len(tar_files)} 个镜像文件")
@@ -119,110 +86,219 @@ class DockerImageImporter:
                 manifest = json.load(f)
             
             Logger.info(f"加载镜像清单: {len(manifest.get('images', []))} 个镜像")
+            self._manifest_names = {
+                img['file']: img['name'] for img in manifest.get('images', [])
+                if 'file' in img and 'name' in img
+            }
             return manifest
         except Exception as e:
             Logger.error(f"读取镜像清单失败: {e}")
             return None
     
-    def get_image_name_from_tar(self, tar_file: Path) -> Optional[str]:
-        """从 tar 文件获取镜像名称"""
+    @staticmethod
+    def _peek_tar_repotags(tar_file: Path) -> List[str]:
+        """读取 tar 内 manifest.json 中的 RepoTags (只读取文件头，不解压镜像层)"""
+        with tarfile.open(tar_file, 'r:') as tar:
+            member = tar.getmember('manifest.json')
+            manifest_fp = tar.extractfile(member)
+            if manifest_fp is None:
+                return []
+            manifest = json.load(manifest_fp)
+        
+        # manifest.json 应为对象列表，格式异常时忽略不符合预期的部分
+        if not isinstance(manifest, list):
+            return []
+        
+        repo_tags = []
+        for entry in manifest:
+            if not isinstance(entry, dict):
+                continue
+            tags = entry.get('RepoTags') or []
+            if isinstance(tags, list):
+                repo_tags.extend(tag for tag in tags if isinstance(tag, str))
+        return repo_tags
+    
+    def _get_tar_repotags(self, tar_file: Path) -> List[str]:
+        """获取 tar 文件中的镜像标签 (结果按文件缓存，读取失败时返回空列表)"""
+        if tar_file not in self._tar_repotags and is_zstd_archive(tar_file):
+            # 压缩归档无法只读取文件头，改用附属文件或镜像清单中记录的镜像名
+            image = self._read_sidecar(tar_file) or self._manifest_names.get(tar_file.name)
+            self._tar_repotags[tar_file] = [image] if image else []
+        elif tar_file not in self._tar_repotags:
+            try:
+                self._tar_repotags[tar_file] = self._peek_tar_repotags(tar_file)
+            except (tarfile.TarError, KeyError, ValueError, OSError, AttributeError, TypeError) as e:
+                Logger.debug(f"读取 manifest.json 失败 {tar_file}: {e}")
+                self._tar_repotags[tar_file] = []
+        return self._tar_repotags[tar_file]
+    
+    @staticmethod
+    def _tar_is_complete(tar_file: Path) -> bool:
+        """检查 tar 文件末尾是否为两个全零块 (tar 归档结束标记)"""
         try:
-            # 尝试从文件名推断镜像名
-            filename = tar_file.stem  # 去掉 .tar 扩展名
-            
-            # 将文件名转换回镜像名格式
-            # 例如: haxqer_confluence-9.2.1.tar -> haxqer/confluence:9.2.1
-            if '_' in filename and '-' in filename:
-                parts = filename.split('_', 1)
-                if len(parts) == 2:
-                    namespace = parts[0]
-                    repo_tag = parts[1].replace('-', ':', 1)
-                    return f"{namespace}/{repo_tag}"
-            
-            # 如果无法从文件名推断，尝试检查 tar 文件内容
-            result = subprocess.run(
-                ['docker', 'load', '--input', str(tar_file), '--quiet'],
-                capture_output=True, text=True
-            )
-            
-            if result.returncode == 0 and result.stderr:
-                # Docker load 输出格式: "Loaded image: image_name:tag"
-                for line in result.stderr.split('\n'):
-                    if line.startswith('Loaded image:'):
-                        return line.split(':', 1)[1].strip()
-            
+            with open(tar_file, 'rb') as f:
+                f.seek(-TAR_END_OF_ARCHIVE, os.SEEK_END)
+                tail = f.read(TAR_END_OF_ARCHIVE)
+        except OSError:
+            # 文件小于 1024 字节时 seek 失败，必然不完整
+            return False
+        return len(tail) == TAR_END_OF_ARCHIVE and not any(tail)
+    
+    @staticmethod
+    def _read_sidecar(tar_file: Path) -> Optional[str]:
+        """读取保存镜像时写入的 .json 附属文件中的镜像名"""
+        sidecar = sidecar_path(tar_file)
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                return json.load(f).get('image')
+        except FileNotFoundError:
             return None
-        except Exception as e:
-            Logger.debug(f"获取镜像名失败 {tar_file}: {e}")
+        except (OSError, ValueError, AttributeError) as e:
+            Logger.debug(f"读取附属文件失败 {sidecar}: {e}")
             return None
     
+    def get_image_name_from_tar(self, tar_file: Path) -> Optional[str]:
+        """从 tar 文件获取镜像名称
+        
+        依次尝试: 保存时写入的 .json 附属文件、镜像清单、tar 内的 manifest.json、文件名推断
+        """
+        image = self._read_sidecar(tar_file)
+        if image:
+            return image
+        
+        if tar_file.name in self._manifest_names:
+            return self._manifest_names[tar_file.name]
+        
+        if not is_zstd_archive(tar_file):
+            try:
+                repo_tags = self._peek_tar_repotags(tar_file)
+                if repo_tags:
+                    return repo_tags[0]
+            except (tarfile.TarError, KeyError, ValueError, OSError, AttributeError, TypeError) as e:
+                Logger.debug(f"读取 manifest.json 失败 {tar_file}: {e}")
+        
+        # 如果 tar 中没有标签信息，尝试从文件名推断
+        filename = archive_stem(tar_file)  # 去掉 .tar / .tar.zst 扩展名
+        
+        # 将文件名转换回镜像名格式
+        # 例如: haxqer_confluence-9.2.1.tar -> haxqer/confluence:9.2.1
+        if '_' in filename and '-' in filename:
+            parts = filename.split('_', 1)
+            if len(parts) == 2:
+                namespace = parts[0]
+                repo_tag = parts[1].replace('-', ':', 1)
+                return f"{namespace}/{repo_tag}"
+        
+        return None
+    
     def image_exists_locally(self, image_name: str) -> bool:
         """检查镜像是否已存在本地"""
-        try:
-            subprocess.run(['docker', 'image', 'inspect', image_name], 
-                         capture_output=True, check=True)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+        return self._image_cache.exists(image_name)
     
-    def import_single_image(self, tar_file: Path, force: bool = False) -> Tuple[str, bool, str]:
+    async def import_single_image(self, tar_file: Path, force: bool = False) -> Tuple[str, bool, str]:
         """导入单个镜像文件"""
         try:
-            with self.print_lock:
-                Logger.info(f"正在导入: {tar_file.name}")
+            Logger.info(f"正在导入: {tar_file.name}")
             
             # 检查文件是否存在
             if not tar_file.exists():
                 error_msg = f"文件不存在: {tar_file}"
-                with self.print_lock:
-                    Logger.error(error_msg)
+                Logger.error(error_msg)
                 return str(tar_file), False, error_msg
             
             # 检查文件大小
             file_size = tar_file.stat().st_size
             if file_size == 0:
                 error_msg = f"文件为空: {tar_file}"
-                with self.print_lock:
-                    Logger.error(error_msg)
+                Logger.error(error_msg)
                 return str(tar_file), False, error_msg
             
-            # 导入镜像
+            # 检查 tar 中的镜像是否已全部存在本地
+            if not force:
+                repo_tags = self._get_tar_repotags(tar_file)
+                if repo_tags and all(self.image_exists_locally(tag) for tag in repo_tags):
+                    image_names = ', '.join(repo_tags)
+                    Logger.info(f"镜像 {image_names} 已存在本地，跳过导入")
+                    self.skipped_images.append(image_names)
+                    return image_names, True, self.SKIPPED
+            
+            # 检查 tar 结尾标记，提前发现未下载/保存完整的文件 (zstd 解压时会自行校验)
+            if not is_zstd_archive(tar_file) and not self._tar_is_complete(tar_file):
+                error_msg = f"文件不完整或已损坏 (缺少 tar 结束标记): {tar_file}"
+                Logger.error(error_msg)
+                return str(tar_file), False, error_msg
+            
+            # 导入镜像: tar 文件 (或 zstd 解压输出) 直接作为 stdin，输出逐行解析
             start_time = time.time()
-            result = subprocess.run(
-                ['docker', 'load', '--input', str(tar_file)],
-                capture_output=True, text=True
-            )
+            imported_image = "unknown"
+            output_lines = []
+            zstd_proc = None
+            with open(tar_file, 'rb') as f:
+                # 未安装 zstd 时直接交给 docker load，由其自行识别并解压 zstd 输入
+                if is_zstd_archive(tar_file) and zstd_binary() is not None:
+                    # zstd 与 docker load 之间通过 OS 管道直连，数据不经过 Python
+                    read_fd, write_fd = os.pipe()
+                    try:
+                        zstd_proc = await asyncio.create_subprocess_exec(
+                            zstd_binary(), '-d', '-q', '-c',
+                            stdin=f, stdout=write_fd, stderr=asyncio.subprocess.PIPE
+                        )
+                        proc = await asyncio.create_subprocess_exec(
+                            *docker_cmd(['load']),
+                            stdin=read_fd, stdout=asyncio.subprocess.PIPE,
+                            stderr=asyncio.subprocess.STDOUT
+                        )
+                    finally:
+                        os.close(read_fd)
+                        os.close(write_fd)
+                else:
+                    proc = await asyncio.create_subprocess_exec(
+                        *docker_cmd(['load']),
+                        stdin=f, stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.STDOUT
+                    )
+                async for raw_line in proc.stdout:
+                    line = raw_line.decode(errors='replace').strip()
+                    if not line:
+                        continue
+                    # Docker load 输出格式: "Loaded image: image_name:tag"
+                    if line.startswith('Loaded image:'):
+                        if imported_image == "unknown":
+                            imported_image = line.split(':', 1)[1].strip()
+                    else:
+                        output_lines.append(line)
+                returncode = await proc.wait()
+                if zstd_proc is not None:
+                    _, zstd_error = await zstd_proc.communicate()
+                    if zstd_proc.returncode != 0:
+                        output_lines.append(f"zstd: {zstd_error.decode(errors='replace').strip()}")
+                        returncode = returncode or zstd_proc.returncode
             end_time = time.time()
             
-            if result.returncode == 0:
-                # 解析导入的镜像名
-                imported_image = "unknown"
-                if result.stderr:
-                    for line in result.stderr.split('\n'):
-                        if line.startswith('Loaded image:'):
-                            imported_image = line.split(':', 1)[1].strip()
-                            break
+            if returncode == 0:
+                if imported_image == "unknown":
+                    imported_image = self.get_image_name_from_tar(tar_file) or "unknown"
+                if imported_image != "unknown":
+                    self._image_cache.mark_local(imported_image)
                 
                 duration = end_time - start_time
                 size_mb = file_size / (1024 * 1024)
                 
-                with self.print_lock:
-                    Logger.success(f"✓ {imported_image} ({size_mb:.1f} MB, {duration:.1f}s)")
+                Logger.success(f"✓ {imported_image} ({size_mb:.1f} MB, {duration:.1f}s)")
                 
                 return imported_image, True, ""
             else:
-                error_msg = f"导入失败: {result.stderr}"
-                with self.print_lock:
-                    Logger.error(f"✗ {tar_file.name}: {error_msg}")
+                error_output = '\n'.join(output_lines)
+                error_msg = f"导入失败: {error_output}"
+                Logger.error(f"✗ {tar_file.name}: {error_msg}")
                 return str(tar_file), False, error_msg
                 
         except Exception as e:
             error_msg = f"导入异常: {e}"
-            with self.print_lock:
-                Logger.error(f"✗ {tar_file.name}: {error_msg}")
+            Logger.error(f"✗ {tar_file.name}: {error_msg}")
             return str(tar_file), False, error_msg
     
-    def import_images(self, tar_files: List[Path], force: bool = False) -> bool:
+    async def import_images(self, tar_files: List[Path], force: bool = False) -> bool:
         """并发导入多个镜像"""
         if not tar_files:
             Logger.error("没有要导入的镜像文件")
@@ -234,32 +310,33 @@ class DockerImageImporter:
         
         start_time = time.time()
         
-        # 使用线程池并发导入
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有导入任务
-            future_to_file = {
-                executor.submit(self.import_single_image, tar_file, force): tar_file 
-                for tar_file in tar_files
-            }
-            
-            # 等待任务完成
-            for future in as_completed(future_to_file):
-                tar_file = future_to_file[future]
+        # 一次性检查所有 tar 中的镜像是否已存在本地
+        if not force:
+            self._image_cache.bulk_check([
+                tag for tar_file in tar_files for tag in self._get_tar_repotags(tar_file)
+            ])
+        
+        # 在单个事件循环中并发导入，由信号量限制同时运行的 docker load 数量
+        semaphore = asyncio.Semaphore(self.max_workers)
+        
+        async def run(tar_file: Path):
+            async with semaphore:
                 try:
-                    image_name, success, error_msg = future.result()
-                    if success:
-                        self.imported_images.append(image_name)
-                    else:
-                        self.failed_imports.append({
-                            'file': str(tar_file),
-                            'error': error_msg
-                        })
+                    image_name, success, error_msg = await self.import_single_image(tar_file, force)
                 except Exception as e:
                     Logger.error(f"处理文件 {tar_file} 时发生异常: {e}")
-                    self.failed_imports.append({
-                        'file': str(tar_file),
-                        'error': str(e)
-                    })
+                    image_name, success, error_msg = str(tar_file), False, str(e)
+            
+            if success:
+                if error_msg != self.SKIPPED:
+                    self.imported_images.append(image_name)
+            else:
+                self.failed_imports.append({
+                    'file': str(tar_file),
+                    'error': error_msg
+                })
+        
+        await asyncio.gather(*(run(tar_file) for tar_file in tar_files))
         
         end_time = time.time()
         duration = end_time - start_time
@@ -301,8 +378,8 @@ class DockerImageImporter:
     def list_imported_images(self):
         """列出已导入的镜像"""
         try:
-            result = subprocess.run(['docker', 'images', '--format', 'table {{.Repository}}:{{.Tag}}\t{{.Size}}\t{{.CreatedAt}}'],
-                                  capture_output=True, text=True, check=True)
+            result = run_docker(['images', '--format', 'table {{.Repository}}:{{.Tag}}\t{{.Size}}\t{{.CreatedAt}}'],
+                                capture_output=True, text=True, check=True)
             
             print(f"\n{Colors.CYAN}本地 Docker 镜像列表:{Colors.NC}")
             print(result.stdout)
@@ -310,32 +387,47 @@ class DockerImageImporter:
         except subprocess.CalledProcessError as e:
             Logger.error(f"获取镜像列表失败: {e}")
     
-    def cleanup_dangling_images(self):
-        """清理悬空镜像"""
+    def cleanup_dangling_images(self, dry_run: bool = False):
+        """清理悬空镜像 (dry_run 时只列出，不删除)"""
         try:
-            Logger.info("正在清理悬空镜像...")
+            if dry_run:
+                # 查找悬空镜像
+                result = run_docker(['images', '-f', 'dangling=true', '-q'],
+                                    capture_output=True, text=True, check=True)
+                
+                dangling_images = result.stdout.strip().split('\n')
+                dangling_images = [img for img in dangling_images if img]
+                
+                if not dangling_images:
+                    Logger.info("没有发现悬空镜像")
+                else:
+                    Logger.info(f"发现 {len(dangling_images)} 个悬空镜像 (dry-run，未删除): "
+                                f"{', '.join(dangling_images)}")
+                return
             
-            # 查找悬空镜像
-            result = subprocess.run(['docker', 'images', '-f', 'dangling=true', '-q'],
-                                  capture_output=True, text=True, check=True)
+            Logger.info("正在清理悬空镜像...")
             
-            dangling_images = result.stdout.strip().split('\n')
-            dangling_images = [img for img in dangling_images if img]
+            # 一次 prune 调用由守护进程完成查找和删除，无需通过命令行传递镜像 ID
+            result = run_docker(['image', 'prune', '-f'],
+                                capture_output=True, text=True)
             
-            if not dangling_images:
-                Logger.info("没有发现悬空镜像")
+            if result.returncode != 0:
+                Logger.warn(f"清理悬空镜像时出现警告: {result.stderr}")
                 return
             
-            Logger.info(f"发现 {len(dangling_images)} 个悬空镜像，正在清理...")
+            # prune 对每个被删除的镜像层也会输出 "deleted:" 行，因此不按行数统计镜像数量
+            has_deleted = False
+            reclaimed = None
+            for line in result.stdout.splitlines():
+                if line.startswith('Deleted Images:'):
+                    has_deleted = True
+                elif line.startswith('Total reclaimed space:'):
+                    reclaimed = line.split(':', 1)[1].strip()
             
-            # 删除悬空镜像
-            result = subprocess.run(['docker', 'rmi'] + dangling_images,
-                                  capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                Logger.success(f"成功清理 {len(dangling_images)} 个悬空镜像")
+            if not has_deleted:
+                Logger.info("没有发现悬空镜像")
             else:
-                Logger.warn(f"清理悬空镜像时出现警告: {result.stderr}")
+                Logger.success(f"成功清理悬空镜像 (释放空间: {reclaimed or '未知'})")
                 
         except subprocess.CalledProcessError as e:
             Logger.error(f"清理悬空镜像失败: {e}")
@@ -363,6 +455,9 @@ def main():
   # 导入后清理悬空镜像
   python3 import_images.py --cleanup
   
+  # 只查看将被清理的悬空镜像
+  python3 import_images.py --cleanup --dry-run
+  
   # 导入特定的镜像文件
   python3 import_images.py --files image1.tar image2.tar
         """
@@ -372,12 +467,14 @@ def main():
                        help='镜像文件目录 (默认: offline_images)')
     parser.add_argument('--files', '-f', nargs='+',
                        help='指定要导入的镜像文件')
-    parser.add_argument('--workers', '-w', type=int, default=2,
-                       help='并发导入数 (默认: 2)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                       help=f'并发导入数 (默认: CPU 核数，最多 8，本机为 {default_import_workers()})')
     parser.add_argument('--force', action='store_true',
                        help='强制重新导入已存在的镜像')
     parser.add_argument('--cleanup', action='store_true',
                        help='导入后清理悬空镜像')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='配合 --cleanup 使用，只列出悬空镜像而不删除')
     parser.add_argument('--list', '-l', action='store_true',
                        help='导入后列出所有本地镜像')
     parser.add_argument('--no-verify', action='store_true',
@@ -385,11 +482,15 @@ def main():
     
     args = parser.parse_args()
     
+    # 验证参数组合
+    if args.dry_run and not args.cleanup:
+        parser.error("--dry-run 需要与 --cleanup 一起使用")
+    
     # 创建导入器
     importer = DockerImageImporter(args.dir, args.workers)
     
     # 检查 Docker
-    if not importer.check_docker():
+    if not check_docker():
         sys.exit(1)
     
     # 获取要导入的文件列表
@@ -439,11 +540,11 @@ def main():
         print(f"  {i}. {tar_file.name} ({size_mb:.1f} MB)")
     
     # 开始导入
-    success = importer.import_images(tar_files, args.force)
+    success = asyncio.run(importer.import_images(tar_files, args.force))
     
     # 清理悬空镜像
     if args.cleanup:
-        importer.cleanup_dangling_images()
+        importer.cleanup_dangling_images(dry_run=args.dry_run)
     
     # 列出镜像
     if args.list: